@@ -1,21 +1,132 @@
 
+import asyncio
 import json
 import difflib
-from typing import Dict, Optional
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 
+import httpx
 from google import genai
+from google.genai import types
+
+try:
+    from patiencediff import PatienceSequenceMatcher
+except ImportError:
+    PatienceSequenceMatcher = None
+
+
+_CLIENTS: Dict[str, genai.Client] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _build_client(api_key: str) -> genai.Client:
+    limits = httpx.Limits(max_keepalive_connections=32)
+    try:
+        http_options = types.HttpOptions(
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
+    except Exception:
+        # Older SDKs don't accept transport args; keep their default pool.
+        return genai.Client(api_key=api_key)
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+def _get_client(api_key: str) -> genai.Client:
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            client = _CLIENTS[api_key] = _build_client(api_key)
+        return client
+
+
+# The shared clients' async HTTP pools bind to the loop that first uses them,
+# so every async call runs on this one long-lived loop thread.
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP
+    with _CLIENTS_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, daemon=True).start()
+        return _LOOP
 
 
 class AIAgent:
-    def __init__(self, api_key: Optional[str] = None):
+    MEMORY_CACHE_SIZE = 256
+    REVIEW_TOKEN_BUDGET = 4000
+    REVIEW_BATCH_CHARS = 40_000
+    MAX_CONCURRENT_CALLS = 8
+
+    def __init__(self, api_key: Optional[str] = None, cache_dir: Optional[Path] = None):
         if not api_key:
             raise ValueError("Gemini API key not provided")
 
-        self.client = genai.Client(api_key=api_key)
+        self.client = _get_client(api_key)
+        self.aclient = self.client.aio
 
         self.model_name = "gemini-3-flash-preview"
 
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / ".aivcs_llm_cache"
+        self._memory_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._token_counts: "OrderedDict[str, int]" = OrderedDict()
+
+    # ---------- RESPONSE CACHE ----------
+    def _cache_key(self, prompt: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{prompt}".encode()).hexdigest()
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key[2:]}.json"
+
+    def _remember(self, key: str, text: str):
+        self._memory_cache[key] = text
+        self._memory_cache.move_to_end(key)
+        if len(self._memory_cache) > self.MEMORY_CACHE_SIZE:
+            self._memory_cache.popitem(last=False)
+
+    def _cache_get(self, prompt: str) -> Optional[str]:
+        key = self._cache_key(prompt)
+
+        if key in self._memory_cache:
+            self._memory_cache.move_to_end(key)
+            return self._memory_cache[key]
+
+        try:
+            with open(self._cache_path(key)) as f:
+                text = json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+        self._remember(key, text)
+        return text
+
+    def _cache_put(self, prompt: str, text: str):
+        key = self._cache_key(prompt)
+        self._remember(key, text)
+
+        path = self._cache_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump({"text": text}, f)
+        except OSError as e:
+            print("⚠️ LLM CACHE WRITE FAILED:", e)
+
+    def _cache_evict(self, prompt: str):
+        key = self._cache_key(prompt)
+        self._memory_cache.pop(key, None)
+        self._cache_path(key).unlink(missing_ok=True)
+
     def _call_ai(self, prompt: str) -> str:
+        cached = self._cache_get(prompt)
+        if cached is not None:
+            return cached
+
         try:
             response = self.client.models.generate_content(
                 model=self.model_name,
@@ -25,14 +136,95 @@ class AIAgent:
             if not response or not response.text:
                 raise RuntimeError("Empty response from Gemini")
 
-            return response.text.strip()
+            text = response.text.strip()
+
+        except Exception as e:
+            print("🔥 GEMINI API ERROR:", e)
+            raise
+
+        self._cache_put(prompt, text)
+        return text
+
+    def _stream_ai(self, prompt: str) -> Iterator[str]:
+        cached = self._cache_get(prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        try:
+            for chunk in self.client.models.generate_content_stream(
+                model=self.model_name,
+                contents=prompt
+            ):
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+
+        except Exception as e:
+            print("🔥 GEMINI API ERROR:", e)
+            raise
+
+        text = "".join(parts).strip()
+        if text:
+            self._cache_put(prompt, text)
+
+    def _call_ai_json(self, prompt: str) -> Dict:
+        # a reply that doesn't parse must not stay cached, or the same input
+        # would be pinned to the fallback forever
+        text = self._call_ai(prompt)
+        try:
+            return self._extract_json(text)
+        except Exception:
+            self._cache_evict(prompt)
+            raise
+
+    async def _a_call_ai(self, prompt: str) -> str:
+        cached = self._cache_get(prompt)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self.aclient.models.generate_content(
+                model=self.model_name,
+                contents=prompt
+            )
+
+            if not response or not response.text:
+                raise RuntimeError("Empty response from Gemini")
+
+            text = response.text.strip()
 
         except Exception as e:
             print("🔥 GEMINI API ERROR:", e)
             raise
 
+        self._cache_put(prompt, text)
+        return text
+
+    async def _a_call_ai_json(self, prompt: str) -> Dict:
+        text = await self._a_call_ai(prompt)
+        try:
+            return self._extract_json(text)
+        except Exception:
+            self._cache_evict(prompt)
+            raise
+
+    # ---------- COMMIT MESSAGE ----------
     def generate_commit_message(self, diff: str) -> Dict[str, str]:
-        prompt = f"""
+        try:
+            return self._call_ai_json(self._commit_message_prompt(diff))
+        except Exception:
+            return self._commit_message_fallback()
+
+    async def a_generate_commit_message(self, diff: str) -> Dict[str, str]:
+        try:
+            return await self._a_call_ai_json(self._commit_message_prompt(diff))
+        except Exception:
+            return self._commit_message_fallback()
+
+    def _commit_message_prompt(self, diff: str) -> str:
+        return f"""
 You are an expert software engineer.
 
 Generate a conventional commit message.
@@ -53,17 +245,44 @@ JSON:
 }}
 """
 
-        try:
-            return self._extract_json(self._call_ai(prompt))
-        except Exception:
-            return {
-                "title": "Update files",
-                "description": "Multiple changes",
-                "risk_level": "medium",
-            }
+    def _commit_message_fallback(self) -> Dict[str, str]:
+        return {
+            "title": "Update files",
+            "description": "Multiple changes",
+            "risk_level": "medium",
+        }
 
+    # ---------- CODE REVIEW ----------
     def review_code(self, diff: str, file_path: str) -> Dict:
-        prompt = f"""
+        try:
+            return self._call_ai_json(self._review_prompt(diff, file_path))
+        except Exception as e:
+            print("❌ SECURITY SCAN FAILED:", e)
+            return self._review_fallback()
+
+    async def a_review_code(self, diff: str, file_path: str) -> Dict:
+        try:
+            return await self._a_call_ai_json(self._review_prompt(diff, file_path))
+        except Exception as e:
+            print("❌ SECURITY SCAN FAILED:", e)
+            return self._review_fallback()
+
+    def run_async(self, coro):
+        # blocks the calling (worker) thread until coro finishes on the AI loop
+        return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+    async def a_review_code_many(self, files: List[Tuple[str, str]]) -> Dict[str, Dict]:
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_CALLS)
+
+        async def review(path: str, code: str) -> Dict:
+            async with semaphore:
+                return await self.a_review_code(code, path)
+
+        results = await asyncio.gather(*(review(path, code) for path, code in files))
+        return {path: result for (path, _), result in zip(files, results)}
+
+    def _review_prompt(self, diff: str, file_path: str) -> str:
+        return f"""
 You are a senior security engineer performing a secure code review.
 
 Analyze the following source code and identify:
@@ -102,64 +321,293 @@ JSON FORMAT:
 }}
 """
 
+    def _review_fallback(self) -> Dict:
+        return {
+            "issues": ["Unable to analyze code"],
+            "suggestions": ["Check code manually"],
+            "overall_quality": 5,
+        }
+
+    def _count_tokens(self, text: str) -> int:
+        key = hashlib.sha1(text.encode()).hexdigest()
+        if key in self._token_counts:
+            self._token_counts.move_to_end(key)
+            return self._token_counts[key]
 
         try:
-            return self._extract_json(self._call_ai(prompt))
+            count = self.client.models.count_tokens(
+                model=self.model_name,
+                contents=text
+            ).total_tokens
         except Exception as e:
-            print("❌ SECURITY SCAN FAILED:", e)
-            return {
-                "issues": ["Unable to analyze code"],
-                "suggestions": ["Check code manually"],
-                "overall_quality": 5,
-            }
-
-    def natural_language_command(self, command: str, context: Dict) -> Dict:
+            print("⚠️ TOKEN COUNT FAILED:", e)
+            count = len(text) // 4
+
+        self._token_counts[key] = count
+        if len(self._token_counts) > self.MEMORY_CACHE_SIZE:
+            self._token_counts.popitem(last=False)
+        return count
+
+    def _trim_for_review(self, code: str, max_tokens: Optional[int] = None) -> str:
+        max_tokens = max_tokens or self.REVIEW_TOKEN_BUDGET
+
+        # Blank lines and trailing whitespace cost tokens without helping the
+        # review; comments and literals are kept since they can hide secrets.
+        code = "\n".join(line.rstrip() for line in code.splitlines() if line.strip())
+
+        # ~4 chars/token is close enough away from the budget; only spend a
+        # count_tokens round-trip when the estimate is borderline.
+        tokens = max(len(code) // 4, 1)
+        if tokens <= max_tokens * 3 // 4:
+            return code
+        if tokens < max_tokens * 3 // 2:
+            tokens = self._count_tokens(code)
+            if tokens <= max_tokens:
+                return code
+
+        # Scale by the chars-per-token ratio and cut at a line end.
+        keep = len(code) * max_tokens // tokens
+        cut = code.rfind("\n", 0, keep)
+        return code[:cut if cut > 0 else keep]
+
+    def review_code_batch(self, files: List[Tuple[str, str]]) -> Dict[str, Dict]:
+        results: Dict[str, Dict] = {}
+        for batch in self._pack_review_batches(files):
+            results.update(self._review_batch(batch))
+        return results
+
+    def _pack_review_batches(self, files: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        batches: List[List[Tuple[str, str]]] = []
+        current: List[Tuple[str, str]] = []
+        size = 0
+
+        for path, code in files:
+            code = self._trim_for_review(code)
+            if current and size + len(code) >= self.REVIEW_BATCH_CHARS:
+                batches.append(current)
+                current, size = [], 0
+            current.append((path, code))
+            size += len(code)
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _review_batch(self, batch: List[Tuple[str, str]]) -> Dict[str, Dict]:
+        payload = [{"file": path, "code": code} for path, code in batch]
         prompt = f"""
-You are an intelligent assistant for a version control system.
+You are a senior security engineer performing a secure code review.
 
-User input:
-{command}
+For EACH file below, identify:
 
-Repository context:
-{json.dumps(context, indent=2)}
+- Security vulnerabilities
+- Logic bugs
+- Insecure coding patterns
+- OWASP Top 10 risks
+- Performance concerns
 
-Respond clearly and concisely.
+Then provide a security and code quality score per file.
+
+SCORING RULES:
+- Score must be an integer from 1 to 10
+- 1 = Extremely insecure / critical flaws
+- 5 = Moderate issues
+- 10 = Secure, clean, production-ready
+
+STRICT OUTPUT RULES:
+- Return ONLY valid JSON
+- No markdown
+- No explanations outside JSON
+- One entry in "results" per input file, using the same "file" value
+- "overall_quality" must be a number, not text
+
+Files:
+{json.dumps(payload, indent=2)}
+
+JSON FORMAT:
+{{
+  "results": [
+    {{
+      "file": "path/of/file",
+      "issues": ["list vulnerabilities or bugs"],
+      "suggestions": ["recommended fixes"],
+      "overall_quality": 8
+    }}
+  ]
+}}
 """
 
+        try:
+            entries = self._call_ai_json(prompt).get("results", [])
+        except Exception as e:
+            print("❌ BATCH SECURITY SCAN FAILED:", e)
+            entries = []
+
+        by_file = {e.get("file"): e for e in entries if isinstance(e, dict)}
+        results = {}
+        for path, _ in batch:
+            entry = by_file.get(path)
+            if entry is None:
+                results[path] = self._review_fallback()
+                continue
+            results[path] = {
+                "issues": entry.get("issues", []),
+                "suggestions": entry.get("suggestions", []),
+                "overall_quality": entry.get("overall_quality", 5),
+            }
+        return results
+
+    # ---------- CHAT ----------
+    def natural_language_command(self, command: str, context: Dict) -> Dict:
         try:
             return {
                 "action": "chat",
-                "explanation": self._call_ai(prompt),
+                "explanation": self._call_ai(self._command_prompt(command, context)),
             }
         except Exception:
+            return self._command_fallback()
+
+    async def a_natural_language_command(self, command: str, context: Dict) -> Dict:
+        try:
             return {
                 "action": "chat",
-                "explanation": "AI unavailable at the moment.",
+                "explanation": await self._a_call_ai(self._command_prompt(command, context)),
             }
+        except Exception:
+            return self._command_fallback()
 
-    def _extract_json(self, text: str) -> Dict:
-        text = text.strip()
+    def natural_language_command_stream(self, command: str, context: Dict) -> Iterator[str]:
+        streamed = False
+        try:
+            for text in self._stream_ai(self._command_prompt(command, context)):
+                streamed = True
+                yield text
+        except Exception:
+            if not streamed:
+                yield self._command_fallback()["explanation"]
+
+    def _command_prompt(self, command: str, context: Dict) -> str:
+        return f"""
+You are an intelligent assistant for a version control system.
 
-        if "```" in text:
-            text = text.split("```")[1].strip()
+User input:
+{command}
 
-        start = text.find("{")
-        end = text.rfind("}") + 1
+Repository context:
+{json.dumps(context, indent=2)}
 
-        if start == -1 or end == -1:
-            raise ValueError("No JSON found in Gemini response")
+Respond clearly and concisely.
+"""
 
-        return json.loads(text[start:end])
+    def _command_fallback(self) -> Dict:
+        return {
+            "action": "chat",
+            "explanation": "AI unavailable at the moment.",
+        }
+
+    _json_decoder = json.JSONDecoder()
+
+    def _extract_json(self, text: str) -> Dict:
+        # raw_decode stops at the end of the first complete object, so fences
+        # or trailing prose after it never need to be scanned.
+        start = text.find("{")
+        while start != -1:
+            try:
+                obj, _ = self._json_decoder.raw_decode(text, start)
+                return obj
+            except ValueError:
+                pass
+
+            # Never retry inside a broken object: a nested dict from a
+            # truncated reply would be returned as if it were the answer.
+            end = self._skip_braced(text, start)
+            if end == -1:
+                break
+            start = text.find("{", end)
+
+        raise ValueError("No JSON found in Gemini response")
+
+    @staticmethod
+    def _skip_braced(text: str, start: int) -> int:
+        # index just past the "}" closing the "{" at start, or -1 if unclosed
+        depth = 0
+        in_string = escaped = False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        return -1
 
 
 class DiffGenerator:
+    CACHE_SIZE = 128
+    _cache: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+
     @staticmethod
-    def generate_diff(old: str, new: str, filename="file") -> str:
-        return "".join(
-            difflib.unified_diff(
-                old.splitlines(True),
-                new.splitlines(True),
-                fromfile=f"a/{filename}",
-                tofile=f"b/{filename}",
-            )
+    def _matcher(a, b):
+        # autojunk misfires on code, where blank lines and braces repeat a lot
+        if PatienceSequenceMatcher is not None:
+            return PatienceSequenceMatcher(None, a, b)
+        return difflib.SequenceMatcher(None, a, b, autojunk=False)
+
+    @staticmethod
+    def _format_range(start: int, stop: int) -> str:
+        length = stop - start
+        if length == 1:
+            return f"{start + 1}"
+        if not length:
+            start -= 1
+        return f"{start + 1},{length}"
+
+    @classmethod
+    def generate_diff(cls, old: str, new: str, filename="file") -> str:
+        key = (
+            hashlib.sha1(old.encode()).hexdigest(),
+            hashlib.sha1(new.encode()).hexdigest(),
+            filename,
         )
+        if key in cls._cache:
+            cls._cache.move_to_end(key)
+            return cls._cache[key]
+
+        a = old.splitlines(True)
+        b = new.splitlines(True)
+
+        out: List[str] = []
+        for group in cls._matcher(a, b).get_grouped_opcodes(3):
+            if not out:
+                out.append(f"--- a/{filename}\n")
+                out.append(f"+++ b/{filename}\n")
+
+            first, last = group[0], group[-1]
+            out.append(
+                f"@@ -{cls._format_range(first[1], last[2])} "
+                f"+{cls._format_range(first[3], last[4])} @@\n"
+            )
+            for tag, i1, i2, j1, j2 in group:
+                if tag == "equal":
+                    out.extend(" " + line for line in a[i1:i2])
+                    continue
+                if tag in ("replace", "delete"):
+                    out.extend("-" + line for line in a[i1:i2])
+                if tag in ("replace", "insert"):
+                    out.extend("+" + line for line in b[j1:j2])
+
+        diff = "".join(out)
+        cls._cache[key] = diff
+        if len(cls._cache) > cls.CACHE_SIZE:
+            cls._cache.popitem(last=False)
+        return diff
@@ -24,6 +24,14 @@ class VCSGui:
 
         self.selected_review_file: Optional[Path] = None
 
+        self.history_limit = 50
+        # (repository, head) the history view was last rendered for
+        self._last_rendered = None
+
+        # VCS state isn't thread-safe, so only one background VCS operation
+        # runs at a time (see _run_vcs)
+        self._vcs_busy = False
+
         self._setup_style()
         self._create_menu()
         self._create_layout()
@@ -38,6 +46,7 @@ class VCSGui:
         self.root.config(menu=menu)
 
         repo = tk.Menu(menu, tearoff=0)
+        self.repo_menu = repo
         menu.add_cascade(label="Repository", menu=repo)
         repo.add_command(label="Initialize New", command=self.init_repo)
         repo.add_command(label="Open Existing", command=self.open_repo)
@@ -52,6 +61,7 @@ class VCSGui:
     def _create_layout(self):
         toolbar = ttk.Frame(self.root)
         toolbar.pack(fill=tk.X, padx=5, pady=5)
+        self.toolbar = toolbar
 
         ttk.Button(toolbar, text="New Repo", command=self.init_repo).pack(side=tk.LEFT, padx=3)
         ttk.Button(toolbar, text="Open Repo", command=self.open_repo).pack(side=tk.LEFT, padx=3)
@@ -113,6 +123,8 @@ class VCSGui:
 
         ttk.Button(review_tab, text="Select Code File", command=self.select_code_file).pack()
         ttk.Button(review_tab, text="Run Security Scan", command=self.run_security_scan).pack()
+        ttk.Button(review_tab, text="Scan Multiple Files", command=self.select_and_scan_many).pack()
+        ttk.Button(review_tab, text="Scan Repo", command=self.run_repo_scan).pack()
 
         self.review_output = scrolledtext.ScrolledText(review_tab)
         self.review_output.pack(fill=tk.BOTH, expand=True)
@@ -130,6 +142,49 @@ class VCSGui:
     )
 
 
+    def _run_bg(self, fn, on_done, on_error=None):
+        # run fn on a worker thread and hand its result (or exception) back
+        # to the Tk thread
+        on_error = on_error or self._show_bg_error
+
+        def worker():
+            try:
+                result = fn()
+            except Exception as e:
+                self.root.after(0, lambda err=e: on_error(err))
+                return
+            self.root.after(0, lambda: on_done(result))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _run_vcs(self, fn, on_done, status):
+        if self._vcs_busy:
+            return
+
+        self._set_vcs_busy(True)
+        self._update_status(status)
+
+        def done(result):
+            self._set_vcs_busy(False)
+            on_done(result)
+
+        def failed(err):
+            self._set_vcs_busy(False)
+            self._show_bg_error(err)
+
+        self._run_bg(fn, done, failed)
+
+    def _set_vcs_busy(self, busy: bool):
+        self._vcs_busy = busy
+        for child in self.toolbar.winfo_children():
+            child.state(["disabled"] if busy else ["!disabled"])
+        for label in ("Initialize New", "Open Existing", "Rollback to Commit"):
+            self.repo_menu.entryconfig(label, state=tk.DISABLED if busy else tk.NORMAL)
+
+    def _show_bg_error(self, err):
+        messagebox.showerror("Error", str(err))
+        self.refresh_all()
+
     def _show_welcome_message(self):
         self.chat_display.insert(
             tk.END,
@@ -170,10 +225,14 @@ class VCSGui:
             return
 
         files = filedialog.askopenfilenames(initialdir=self.repo_path)
-        for f in files:
-            self.vcs.add(str(Path(f).relative_to(self.repo_path)))
+        if not files:
+            return
 
-        self.refresh_staging()
+        vcs = self.vcs
+        paths = [str(Path(f).relative_to(self.repo_path)) for f in files]
+        self._run_vcs(
+            lambda: vcs.add_many(paths), lambda _: self.refresh_all(), "Adding files..."
+        )
 
     def commit_dialog(self):
         if not self.vcs or self.vcs.staging.is_empty():
@@ -186,9 +245,14 @@ class VCSGui:
         msg.pack()
 
         def commit():
-            self.vcs.commit(msg.get("1.0", tk.END).strip())
+            if self._vcs_busy:
+                return
+            vcs = self.vcs
+            message = msg.get("1.0", tk.END).strip()
             win.destroy()
-            self.refresh_all()
+            self._run_vcs(
+                lambda: vcs.commit(message), lambda _: self.refresh_all(), "Committing..."
+            )
 
         ttk.Button(win, text="Commit", command=commit).pack()
 
@@ -212,7 +276,7 @@ class VCSGui:
 
         def rollback():
             sel = lb.curselection()
-            if not sel:
+            if not sel or self._vcs_busy:
                 return
 
             commit_id = commits[sel[0]]["id"]
@@ -222,10 +286,11 @@ class VCSGui:
             ):
                 return
 
-            self.vcs.checkout(commit_id)
-
-            self.refresh_all()
+            vcs = self.vcs
             win.destroy()
+            self._run_vcs(
+                lambda: vcs.checkout(commit_id), lambda _: self.refresh_all(), "Rolling back..."
+            )
 
         ttk.Button(win, text="Rollback", command=rollback).pack(pady=10)
 
@@ -239,6 +304,8 @@ class VCSGui:
         entry.pack()
 
         def create():
+            if self._vcs_busy:
+                return
             self.vcs.create_branch(entry.get().strip())
             win.destroy()
             self.refresh_all()
@@ -260,7 +327,7 @@ class VCSGui:
 
         def switch():
             sel = lb.curselection()
-            if sel:
+            if sel and not self._vcs_busy:
                 self.vcs.checkout(lb.get(sel[0]))
                 win.destroy()
                 self.refresh_all()
@@ -275,13 +342,17 @@ class VCSGui:
         self.chat_display.insert(tk.END, f"You: {text}\n")
         self.chat_entry.delete(0, tk.END)
 
+        def show(t):
+            self.root.after(0, lambda: self.chat_display.insert(tk.END, t))
+
         def respond():
-            reply = (
-                self.ai_agent.natural_language_command(text, {})["explanation"]
-                if self.ai_agent
-                else self.offline_assistant.respond(text, {})
-            )
-            self.chat_display.insert(tk.END, f"AI: {reply}\n\n")
+            show("AI: ")
+            if self.ai_agent:
+                for chunk in self.ai_agent.natural_language_command_stream(text, {}):
+                    show(chunk)
+            else:
+                show(self.offline_assistant.respond(text, {}))
+            show("\n\n")
 
         threading.Thread(target=respond, daemon=True).start()
 
@@ -306,12 +377,88 @@ class VCSGui:
         if not self.selected_review_file or not self.ai_agent:
             return
 
-        code = self.selected_review_file.read_text(errors="ignore")
-        result = self.ai_agent.review_code(code[:3000], str(self.selected_review_file))
+        path = self.selected_review_file
+        agent = self.ai_agent
+
+        def scan():
+            code = path.read_text(errors="ignore")
+            return agent.review_code(agent._trim_for_review(code), str(path))
+
+        def show(result):
+            self.review_output.delete("1.0", tk.END)
+            for issue in result["issues"]:
+                self.review_output.insert(tk.END, f"- {issue}\n")
 
         self.review_output.delete("1.0", tk.END)
-        for issue in result["issues"]:
-            self.review_output.insert(tk.END, f"- {issue}\n")
+        self.review_output.insert(tk.END, "Scanning...\n")
+        self._run_bg(scan, show, self._show_scan_error)
+
+    def select_and_scan_many(self):
+        if not self.ai_agent:
+            return
+
+        files = filedialog.askopenfilenames(initialdir=self.repo_path)
+        if files:
+            self.run_security_scan_many([Path(f) for f in files])
+
+    def run_security_scan_many(self, paths):
+        agent = self.ai_agent
+
+        def scan():
+            files = [
+                (str(p), agent._trim_for_review(p.read_text(errors="ignore")))
+                for p in paths
+            ]
+            return agent.run_async(agent.a_review_code_many(files))
+
+        self.review_output.delete("1.0", tk.END)
+        self.review_output.insert(tk.END, "Scanning...\n")
+        self._run_bg(scan, self._show_review_results, self._show_scan_error)
+
+    def _show_scan_error(self, err):
+        self.review_output.delete("1.0", tk.END)
+        self.review_output.insert(tk.END, f"Scan failed: {err}\n")
+
+    def _show_review_results(self, results):
+        self.review_output.delete("1.0", tk.END)
+        for path, result in results.items():
+            self.review_output.insert(
+                tk.END, f"{path} (score: {result['overall_quality']})\n"
+            )
+            for issue in result["issues"]:
+                self.review_output.insert(tk.END, f"- {issue}\n")
+            self.review_output.insert(tk.END, "\n")
+
+    def run_repo_scan(self):
+        if not self.vcs or not self.ai_agent or not self.vcs.file_store:
+            return
+
+        history = self.vcs.graph.get_history()
+        if not history:
+            messagebox.showinfo("Scan Repo", "No commits to scan.")
+            return
+
+        # a commit only holds the files staged for it, so the newest version
+        # of each path is the first one seen walking back from HEAD
+        latest = {}
+        for commit in history:
+            for path, h in commit.files.items():
+                latest.setdefault(path, h)
+
+        store = self.vcs.file_store
+        agent = self.ai_agent
+
+        def scan():
+            files = []
+            for path, h in latest.items():
+                data = store.read_file(h)
+                if data is not None:
+                    files.append((path, data.decode(errors="ignore")))
+            return agent.review_code_batch(files)
+
+        self.review_output.delete("1.0", tk.END)
+        self.review_output.insert(tk.END, "Scanning...\n")
+        self._run_bg(scan, self._show_review_results, self._show_scan_error)
 
     def refresh_staging(self):
         self.staging.delete(0, tk.END)
@@ -324,15 +471,38 @@ class VCSGui:
             self.staging.insert(tk.END, f)
 
     def refresh_history(self):
-        self.history.delete(*self.history.get_children())
         if not self.vcs:
+            self.history.delete(*self.history.get_children())
+            self._last_rendered = None
             return
 
-        for c in self.vcs.log(50):
-            self.history.insert(
-                "", tk.END,
-                values=(c["id"], c["message"], c["author"], c["timestamp"])
-            )
+        head = self.vcs.graph.head
+        if self._last_rendered == (self.vcs, head):
+            return
+
+        last_vcs, last_head = self._last_rendered or (None, None)
+        self._last_rendered = (self.vcs, head)
+
+        if last_vcs is self.vcs and last_head:
+            newer = self.vcs.log(self.history_limit, since=last_head)
+            if newer and newer[-1]["parent"] == last_head:
+                # HEAD moved forward: prepend only the new commits
+                for c in reversed(newer):
+                    self._insert_history_row(c, 0)
+                rows = self.history.get_children()
+                if len(rows) > self.history_limit:
+                    self.history.delete(*rows[self.history_limit:])
+                return
+
+        self.history.delete(*self.history.get_children())
+        for c in self.vcs.log(self.history_limit):
+            self._insert_history_row(c, tk.END)
+
+    def _insert_history_row(self, c, index):
+        self.history.insert(
+            "", index,
+            values=(c["id"], c["message"], c["author"], c["timestamp"])
+        )
 
     def refresh_all(self):
         self.refresh_staging()
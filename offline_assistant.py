@@ -1,30 +1,55 @@
+import re
+from typing import Dict, List, Tuple
 
-from typing import Dict
+
+SECURITY_TIPS = (
+    "⚠️ AI security scan requires an API key.\n\n"
+    "General secure coding tips:\n"
+    "• Validate all user input\n"
+    "• Avoid hardcoded secrets\n"
+    "• Use parameterized queries\n"
+    "• Handle exceptions safely\n"
+    "• Follow least privilege\n"
+)
+
+COMMIT_HELP = (
+    "A commit saves a snapshot of your project.\n"
+    "Steps:\n"
+    "1. Add files\n"
+    "2. Write a message\n"
+    "3. Commit changes"
+)
 
 
 class OfflineAssistant:
-    def respond(self, message: str, context: Dict) -> str:
-        msg = message.lower()
+    def __init__(self):
+        # (keyword, answer) in priority order; earlier keywords win when
+        # several appear in the same message
+        self._answers: List[Tuple[str, str]] = [
+            ("security", SECURITY_TIPS),
+            ("vulnerability", SECURITY_TIPS),
+            ("commit", COMMIT_HELP),
+        ]
+        self._compile()
 
-        if "security" in msg or "vulnerability" in msg:
-            return (
-                "⚠️ AI security scan requires an API key.\n\n"
-                "General secure coding tips:\n"
-                "• Validate all user input\n"
-                "• Avoid hardcoded secrets\n"
-                "• Use parameterized queries\n"
-                "• Handle exceptions safely\n"
-                "• Follow least privilege\n"
-            )
+    def register(self, keyword: str, answer: str):
+        keyword = keyword.lower()
+        self._answers = [(k, a) for k, a in self._answers if k != keyword]
+        self._answers.append((keyword, answer))
+        self._compile()
 
-        if "commit" in msg:
-            return (
-                "A commit saves a snapshot of your project.\n"
-                "Steps:\n"
-                "1. Add files\n"
-                "2. Write a message\n"
-                "3. Commit changes"
-            )
+    def _compile(self):
+        # zero-width lookahead so overlapping keywords ("commit" inside
+        # "commits") are all reported, not just the longest alternative
+        alternation = "|".join(re.escape(k) for k, _ in self._answers)
+        self._pattern = re.compile(f"(?=({alternation}))", re.IGNORECASE)
+
+    def respond(self, message: str, context: Dict) -> str:
+        found = {m.group(1).lower() for m in self._pattern.finditer(message)}
+
+        for keyword, answer in self._answers:
+            if keyword in found:
+                return answer
 
         if not context.get("branch"):
             return (
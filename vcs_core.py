@@ -3,11 +3,81 @@
 import hashlib
 import json
 import os
+import secrets
 import shutil
+import sys
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# "sha1" (default) or "blake3"; blake3 needs the optional `blake3` package
+HASH_ALG = os.environ.get("AIVCS_HASH", "sha1").lower()
+if HASH_ALG == "blake3" and blake3 is None:
+    HASH_ALG = "sha1"
+
+
+
+def json_dumps(obj, indent: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def json_loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Linux FICLONE ioctl: copy-on-write clone on btrfs/xfs/etc.
+FICLONE = 0x40049409
+
+
+def new_hasher():
+    if HASH_ALG == "blake3":
+        return blake3.blake3(max_threads=blake3.blake3.AUTO)
+    return hashlib.sha1()
+
+
+def reflink_file(src: Path, dst: Path) -> bool:
+    # Hardlinks would let in-place edits of the working file rewrite stored
+    # objects, so only CoW clones are used. FICLONE is Linux-only, and dst is
+    # truncated before the attempt, so no other platform gets this far.
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError:
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def clone_file(src: Path, dst: Path):
+    if not reflink_file(src, dst):
+        shutil.copy2(src, dst)
 
 
 # =========================
@@ -21,14 +91,14 @@ class Commit:
         self.timestamp = datetime.now().isoformat()
         self.parent = parent
         self.files: Dict[str, str] = {}
-        self.children: List[str] = []
 
     def _generate_id(self) -> str:
-        raw = f"{datetime.now().isoformat()}{os.urandom(16).hex()}"
-        return hashlib.sha1(raw.encode()).hexdigest()[:8]
+        return secrets.token_hex(4)
 
     def add_file(self, filepath: str, file_hash: str):
-        self.files[filepath] = file_hash
+        # unchanged files repeat the same path/hash in every commit; interning
+        # lets all commits share one string object for each
+        self.files[sys.intern(filepath)] = sys.intern(file_hash)
 
     def to_dict(self) -> dict:
         return {
@@ -38,7 +108,6 @@ class Commit:
             "timestamp": self.timestamp,
             "parent": self.parent,
             "files": self.files,
-            "children": self.children,
         }
 
     @classmethod
@@ -49,8 +118,7 @@ class Commit:
         obj.author = data["author"]
         obj.timestamp = data["timestamp"]
         obj.parent = data["parent"]
-        obj.files = data["files"]
-        obj.children = data["children"]
+        obj.files = {sys.intern(k): sys.intern(v) for k, v in data["files"].items()}
         return obj
 
 
@@ -64,11 +132,16 @@ class CommitGraph:
         self.branches: Dict[str, Optional[str]] = {"main": None}
         self.current_branch = "main"
 
+        # (start commit id, full chain back to root) of the last full walk
+        self._history_cache: Optional[Tuple[str, List[Commit]]] = None
+
+        # ids of commits added since the last save
+        self._dirty: Set[str] = set()
+
     def add_commit(self, commit: Commit) -> str:
         self.commits[commit.id] = commit
-
-        if commit.parent and commit.parent in self.commits:
-            self.commits[commit.parent].children.append(commit.id)
+        self._history_cache = None
+        self._dirty.add(commit.id)
 
         self.head = commit.id
         self.branches[self.current_branch] = commit.id
@@ -77,17 +150,29 @@ class CommitGraph:
     def get_commit(self, commit_id: str) -> Optional[Commit]:
         return self.commits.get(commit_id)
 
-    def get_history(self, start: Optional[str] = None) -> List[Commit]:
+    def get_history(
+        self, start: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Commit]:
+        start = start or self.head
+
+        if self._history_cache and self._history_cache[0] == start:
+            cached = self._history_cache[1]
+            return cached[:limit] if limit is not None else list(cached)
+
         history = []
-        current = start or self.head
+        current = start
 
         while current:
+            if limit is not None and len(history) >= limit:
+                return history
             commit = self.commits.get(current)
             if not commit:
                 break
             history.append(commit)
             current = commit.parent
 
+        if start:
+            self._history_cache = (start, list(history))
         return history
 
     def create_branch(self, name: str):
@@ -98,6 +183,7 @@ class CommitGraph:
             return False
         self.current_branch = name
         self.head = self.branches[name]
+        self._history_cache = None
         return True
 
 
@@ -105,37 +191,147 @@ class CommitGraph:
 # File Store (NO SIDE EFFECTS)
 # =========================
 class FileStore:
+    CHUNK_SIZE = 1 << 20
+
     def __init__(self, repo_path: Path):
         self.repo_path = repo_path
         self.objects_dir = repo_path / ".aivcs" / "objects"
+        self.index_file = repo_path / ".aivcs" / "index.json"
+
+        # path -> {"m": mtime_ns, "c": ctime_ns, "i": inode, "s": size,
+        #          "a": hash alg, "h": hash}
+        self.index: Dict[str, Dict] = {}
+        self._index_dirty = False
+        # mtime of the index file when last read/written; entries whose file
+        # mtime isn't older than this are "racily clean" and always rehashed
+        self._index_time = 0
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, "rb") as f:
+                    self.index = json_loads(f.read())
+                self._index_time = self.index_file.stat().st_mtime_ns
+            except (OSError, ValueError):
+                self.index = {}
 
     def ensure(self):
         self.objects_dir.mkdir(parents=True, exist_ok=True)
 
+    def _index_key(self, filepath: Path) -> str:
+        try:
+            return filepath.relative_to(self.repo_path).as_posix()
+        except ValueError:
+            return str(filepath)
+
+    def _object_path(self, file_hash: str) -> Path:
+        return self.objects_dir / file_hash[:2] / file_hash[2:]
+
+    def _indexed_hash(self, filepath: Path, st: os.stat_result) -> Optional[str]:
+        entry = self.index.get(self._index_key(filepath))
+        if (
+            entry
+            and entry["m"] == st.st_mtime_ns
+            and entry.get("c") == st.st_ctime_ns
+            and entry.get("i") == st.st_ino
+            and entry["s"] == st.st_size
+            and entry.get("a", "sha1") == HASH_ALG
+            and entry["m"] < self._index_time
+        ):
+            return entry["h"]
+        return None
+
+    def _record_hash(self, filepath: Path, st: os.stat_result, file_hash: str):
+        self.index[self._index_key(filepath)] = {
+            "m": st.st_mtime_ns,
+            "c": st.st_ctime_ns,
+            "i": st.st_ino,
+            "s": st.st_size,
+            "a": HASH_ALG,
+            "h": file_hash,
+        }
+        self._index_dirty = True
+
     def hash_file(self, filepath: Path) -> str:
-        sha1 = hashlib.sha1()
+        st = filepath.stat()
+        file_hash = self._indexed_hash(filepath, st)
+        if file_hash is None:
+            file_hash = self._compute_hash(filepath)
+            self._record_hash(filepath, st, file_hash)
+        return file_hash
+
+    def _compute_hash(self, filepath: Path) -> str:
+        if HASH_ALG == "blake3":
+            hasher = new_hasher()
+            hasher.update_mmap(filepath)
+            # truncated to SHA-1 width so the 2/38 object layout is unchanged
+            return hasher.hexdigest()[:40]
+
         with open(filepath, "rb") as f:
-            while chunk := f.read(8192):
+            if hasattr(hashlib, "file_digest"):
+                return hashlib.file_digest(f, "sha1").hexdigest()
+
+            sha1 = hashlib.sha1()
+            while chunk := f.read(self.CHUNK_SIZE):
                 sha1.update(chunk)
-        return sha1.hexdigest()
+            return sha1.hexdigest()
+
+    def flush_index(self):
+        if not self._index_dirty:
+            return
+        with open(self.index_file, "wb") as f:
+            f.write(json_dumps(self.index))
+        self._index_dirty = False
+        self._index_time = self.index_file.stat().st_mtime_ns
 
     def store_file(self, filepath: Path) -> str:
         self.ensure()
-        file_hash = self.hash_file(filepath)
-        obj_dir = self.objects_dir / file_hash[:2]
-        obj_dir.mkdir(exist_ok=True)
-        obj_path = obj_dir / file_hash[2:]
+        st = filepath.stat()
+
+        file_hash = self._indexed_hash(filepath, st)
+        if file_hash is not None and self._object_path(file_hash).exists():
+            return file_hash
+
+        # Write into a temp object while hashing so the source is read once,
+        # then move it into place under its content hash.
+        fd, tmp_name = tempfile.mkstemp(dir=self.objects_dir, prefix="tmp_")
+        os.close(fd)
+        tmp = Path(tmp_name)
+        try:
+            if reflink_file(filepath, tmp):
+                file_hash = self._compute_hash(tmp)
+            else:
+                hasher = new_hasher()
+                with open(filepath, "rb") as src, open(tmp, "wb") as dst:
+                    while chunk := src.read(self.CHUNK_SIZE):
+                        hasher.update(chunk)
+                        dst.write(chunk)
+                shutil.copystat(filepath, tmp)
+                file_hash = hasher.hexdigest()[:40]
+
+            obj_path = self._object_path(file_hash)
+            obj_path.parent.mkdir(exist_ok=True)
+            if obj_path.exists():
+                tmp.unlink()
+            else:
+                tmp.replace(obj_path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+        self._record_hash(filepath, st, file_hash)
+        return file_hash
 
+    def read_file(self, file_hash: str) -> Optional[bytes]:
+        obj_path = self._object_path(file_hash)
         if not obj_path.exists():
-            shutil.copy2(filepath, obj_path)
-
-        return file_hash
+            return None
+        return obj_path.read_bytes()
 
     def restore_file(self, file_hash: str, target: Path):
-        obj_path = self.objects_dir / file_hash[:2] / file_hash[2:]
+        obj_path = self._object_path(file_hash)
         if obj_path.exists():
             target.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(obj_path, target)
+            clone_file(obj_path, target)
+            self._record_hash(target, target.stat(), file_hash)
 
 
 # =========================
@@ -147,8 +343,9 @@ class StagingArea:
         self.file_hashes: Dict[str, str] = {}
 
     def add(self, path: str, file_hash: str):
+        path = sys.intern(path)
         self.staged_files.add(path)
-        self.file_hashes[path] = file_hash
+        self.file_hashes[path] = sys.intern(file_hash)
 
     def clear(self):
         self.staged_files.clear()
@@ -227,14 +424,35 @@ class AIVersionControl:
         if not self.file_store:
             return False
 
-        file_path = self.repo_path / filepath
-        if not file_path.exists() or not file_path.is_file():
+        file_hash = self._add_one(filepath)
+        if file_hash is None:
             return False
 
-        file_hash = self.file_store.store_file(file_path)
         self.staging.add(filepath, file_hash)
         return True
 
+    def add_many(self, filepaths: List[str]) -> List[str]:
+        if not self.file_store or not filepaths:
+            return []
+
+        workers = min(16, (os.cpu_count() or 1) * 2, len(filepaths))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            hashes = list(ex.map(self._add_one, filepaths))
+
+        # staging isn't thread-safe, so update it back on the calling thread
+        added = []
+        for path, file_hash in zip(filepaths, hashes):
+            if file_hash is not None:
+                self.staging.add(path, file_hash)
+                added.append(path)
+        return added
+
+    def _add_one(self, filepath: str) -> Optional[str]:
+        file_path = self.repo_path / filepath
+        if not file_path.exists() or not file_path.is_file():
+            return None
+        return self.file_store.store_file(file_path)
+
     # ---------- COMMIT ----------
     def commit(self, message: str, author: Optional[str] = None) -> Optional[str]:
         if self.staging.is_empty():
@@ -256,8 +474,14 @@ class AIVersionControl:
         return cid
 
     # ---------- LOG ----------
-    def log(self, limit=10) -> List[Dict]:
-        return [c.to_dict() for c in self.graph.get_history()[:limit]]
+    def log(self, limit=10, since: Optional[str] = None) -> List[Dict]:
+        # with `since`, only commits newer than it (walking back from HEAD)
+        result = []
+        for c in self.graph.get_history(limit=limit):
+            if c.id == since:
+                break
+            result.append(c.to_dict())
+        return result
 
     # ---------- STATUS ----------
     def status(self) -> Dict:
@@ -293,33 +517,112 @@ class AIVersionControl:
             return False
 
         for path, h in commit.files.items():
-            self.file_store.restore_file(h, self.repo_path / path)
+            target = self.repo_path / path
+            # the index makes this a stat() for files that haven't changed
+            if target.is_file() and self.file_store.hash_file(target) == h:
+                continue
+            self.file_store.restore_file(h, target)
 
         self.graph.head = commit_id
         self._save_state()
         return True
 
     # ---------- STATE ----------
+    # refs.json holds the small mutable state (head, branches, config);
+    # commits.ndjson is an append-only log with one commit per line.
+    @property
+    def _refs_file(self) -> Path:
+        return self.vcs_dir / "refs.json"
+
+    @property
+    def _commits_file(self) -> Path:
+        return self.vcs_dir / "commits.ndjson"
+
     def _save_state(self):
-        state = {
-            "graph": {
-                "commits": {k: v.to_dict() for k, v in self.graph.commits.items()},
-                "head": self.graph.head,
-                "branches": self.graph.branches,
-                "current_branch": self.graph.current_branch,
-            },
+        if self.file_store:
+            self.file_store.flush_index()
+        self._flush_commits()
+        self._save_refs()
+
+    def _flush_commits(self):
+        dirty = self.graph._dirty
+        if not dirty:
+            return
+
+        self._append_commits([self.graph.commits[cid] for cid in dirty])
+        dirty.clear()
+
+    def _save_refs(self):
+        refs = {
+            "head": self.graph.head,
+            "branches": self.graph.branches,
+            "current_branch": self.graph.current_branch,
             "config": self.config,
         }
-        with open(self.vcs_dir / "state.json", "w") as f:
-            json.dump(state, f, indent=2)
+        with open(self._refs_file, "wb") as f:
+            f.write(json_dumps(refs, indent=True))
+
+    def _append_commits(self, commits: List[Commit]):
+        with open(self._commits_file, "ab") as f:
+            for commit in commits:
+                f.write(json_dumps(commit.to_dict()) + b"\n")
 
     def _load_state(self) -> bool:
+        if not self._refs_file.exists():
+            return self._migrate_legacy_state()
+
+        with open(self._refs_file, "rb") as f:
+            refs = json_loads(f.read())
+
+        self.graph.commits = {}
+        if self._commits_file.exists():
+            self._load_commits()
+
+        self.graph.head = refs["head"]
+        self.graph.branches = refs["branches"]
+        self.graph.current_branch = refs["current_branch"]
+        self.config = refs.get("config", {"author": "User"})
+
+        for c in self.graph.get_history():
+            self.history.push(c.id)
+
+        return True
+
+    def _load_commits(self):
+        with open(self._commits_file, "rb") as f:
+            data = f.read()
+
+        lines = data.split(b"\n")
+        offset = 0
+        for i, line in enumerate(lines):
+            if line.strip():
+                try:
+                    commit = Commit.from_dict(json_loads(line))
+                except (ValueError, KeyError):
+                    # Only the last line can be torn by a crash or full disk
+                    # mid-append (refs are written after it, so nothing points
+                    # at it); anything earlier is real corruption.
+                    if any(rest.strip() for rest in lines[i + 1:]):
+                        raise
+                    with open(self._commits_file, "r+b") as f:
+                        f.truncate(offset)
+                    return
+                self.graph.commits[commit.id] = commit
+            offset += len(line) + 1
+
+        if data and not data.endswith(b"\n"):
+            # complete record but missing its newline; terminate it so the
+            # next append starts on a fresh line
+            with open(self._commits_file, "ab") as f:
+                f.write(b"\n")
+
+    def _migrate_legacy_state(self) -> bool:
         state_file = self.vcs_dir / "state.json"
         if not state_file.exists():
             return False
 
-        with open(state_file) as f:
-            state = json.load(f)
+        with open(state_file, "rb") as f:
+            state = json_loads(f.read())
 
         self.graph.commits = {
             k: Commit.from_dict(v) for k, v in state["graph"]["commits"].items()
@@ -329,6 +632,11 @@ class AIVersionControl:
         self.graph.current_branch = state["graph"]["current_branch"]
         self.config = state.get("config", {"author": "User"})
 
+        self._commits_file.unlink(missing_ok=True)
+        self._append_commits(list(self.graph.commits.values()))
+        self._save_refs()
+        state_file.unlink()
+
         for c in self.graph.get_history():
             self.history.push(c.id)
 